@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Any, Callable, Optional, Tuple
+from config import (INCREMENTAL_CACHE_DIR, INCREMENTAL_PRICE_THRESHOLD,
+                    INCREMENTAL_MAX_AGE_HOURS)
+
+def get_degraded_sections(raw_data: Dict[str, Any]) -> List[str]:
+    """
+    找出数据不完整的部分（company_data/financial_data等）: 使用了备用/模拟数据、只获取到部分数据或获取失败，
+    同时检查下一层的数据（如宏观数据中的 cpi/pmi）
+    """
+    sections = []
+    for key, data in raw_data.items():
+        if not isinstance(data, dict):
+            continue
+        parts = [data] + [v for v in data.values() if isinstance(v, dict)]
+        if any(part.get(flag) for part in parts for flag in ("fallback", "partial", "error")):
+            sections.append(key)
+    return sections
+
+class AnalysisCache:
+    """
+    增量分析缓存类
+    为每个股票的输入数据生成指纹，与上一次的分析记录比较，
+    变化低于阈值时复用上一次的分析结果和报告
+    """
+
+    # 财务数据中表示报告期的字段
+    REPORT_PERIOD_KEYS = ("日期", "报告期", "report_date")
+
+    def __init__(self, cache_dir: str = INCREMENTAL_CACHE_DIR,
+                 price_threshold: float = INCREMENTAL_PRICE_THRESHOLD,
+                 max_age_hours: float = INCREMENTAL_MAX_AGE_HOURS,
+                 report_exists: Callable[[str], bool] = os.path.exists):
+        self.cache_dir = cache_dir
+        self.report_exists = report_exists
+        self.price_threshold = price_threshold
+        self.max_age_hours = max_age_hours
+        os.makedirs(cache_dir, exist_ok=True)
+        print(f"✅ 增量分析缓存初始化完成，缓存目录: {cache_dir}")
+
+    def _normalize(self, value: Any) -> Any:
+        """规范化数据，去掉不影响分析的噪声（浮点精度、说明字段等）"""
+        if isinstance(value, dict):
+            return {str(k): self._normalize(v) for k, v in value.items() if k != "note"}
+        if isinstance(value, (list, tuple)):
+            return [self._normalize(v) for v in value]
+        if isinstance(value, float):
+            return round(value, 4)
+        if isinstance(value, (str, int, bool)) or value is None:
+            return value
+        return str(value)
+
+    def fingerprint(self, data: Any) -> str:
+        """计算数据指纹"""
+        payload = json.dumps(self._normalize(data), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_report_period(self, financial_data: Dict) -> str:
+        """获取财务数据的报告期，没有报告期字段时使用财务数据指纹代替"""
+        for key in self.REPORT_PERIOD_KEYS:
+            if financial_data.get(key):
+                return str(financial_data[key])
+        return self.fingerprint(financial_data)
+
+    def _cache_path(self, symbol: str) -> str:
+        return os.path.join(self.cache_dir, f"analysis_{symbol}.json")
+
+    def load(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """读取某个股票最近一次的分析记录"""
+        path = self._cache_path(symbol)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"❌ 读取 {symbol} 的分析缓存失败: {str(e)}")
+            return None
+
+    def check(self, symbol: str, raw_data: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        判断是否可以复用上一次的分析
+        返回 (可复用的分析记录或None, 原因说明)
+        """
+        if get_degraded_sections(raw_data):
+            return None, "本次数据不完整或使用了备用数据"
+
+        record = self.load(symbol)
+        if not record:
+            return None, "没有历史分析记录"
+        if record.get("degraded"):
+            return None, "上次分析基于不完整的数据"
+
+        # 上一次的报告文件必须仍然存在
+        report_paths = record.get("report_paths", {})
+        if not report_paths or not all(path and self.report_exists(path) for path in report_paths.values()):
+            return None, "历史报告文件缺失"
+
+        try:
+            last_time = datetime.strptime(record["timestamp"], "%Y-%m-%d %H:%M:%S")
+        except (KeyError, ValueError):
+            return None, "历史记录时间无效"
+        age_hours = (datetime.now() - last_time).total_seconds() / 3600
+        if age_hours > self.max_age_hours:
+            return None, f"上次分析已超过{self.max_age_hours}小时"
+
+        if record.get("fingerprint") == self.fingerprint(raw_data):
+            return record, "输入数据无变化"
+
+        if record.get("report_period") != self._get_report_period(raw_data["financial_data"]):
+            return None, "出现新的财务报告期"
+
+        if record.get("macro_fingerprint") != self.fingerprint(raw_data["macro_data"]):
+            return None, "宏观数据已更新"
+
+        last_price = record.get("latest_price")
+        latest_price = raw_data["price_data"].get("latest_price")
+        if not last_price or latest_price is None:
+            return None, "缺少股价数据"
+        price_move = abs(latest_price - last_price) / last_price * 100
+        if price_move >= self.price_threshold:
+            return None, f"股价变动{price_move:.2f}%，超过阈值{self.price_threshold}%"
+
+        return record, f"股价变动{price_move:.2f}%，低于阈值{self.price_threshold}%"
+
+    def save(self, result: Dict[str, Any]):
+        """保存一次完整分析的指纹和结果"""
+        raw_data = result["raw_data"]
+        record = {
+            "symbol": result["symbol"],
+            "company_name": result.get("company_name", ""),
+            "timestamp": result["timestamp"],
+            "fingerprint": self.fingerprint(raw_data),
+            "report_period": self._get_report_period(raw_data["financial_data"]),
+            "macro_fingerprint": self.fingerprint(raw_data["macro_data"]),
+            "latest_price": raw_data["price_data"].get("latest_price"),
+            # 基于不完整数据的分析只记录不复用，数据恢复后需要重新分析
+            "degraded": bool(get_degraded_sections(raw_data)),
+            "analysis": result["analysis"],
+            "report_paths": result.get("report_paths", {})
+        }
+
+        path = self._cache_path(result["symbol"])
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._normalize(record), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"❌ 保存 {result['symbol']} 的分析缓存失败: {str(e)}")
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from typing import Dict, Any, Callable
+from config import (BREAKER_FAILURE_THRESHOLD, BREAKER_RECOVERY_TIMEOUT,
+                    BREAKER_CALL_TIMEOUT)
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被直接拒绝"""
+    pass
+
+class CircuitBreaker:
+    """
+    数据源熔断器
+    连续失败或超时达到阈值后打开，打开期间直接拒绝调用（由调用方使用备用数据）；
+    超过recovery_timeout后放行一次真实调用进行探测，成功则恢复，失败则继续熔断
+    """
+
+    CLOSED = "closed"        # 正常
+    OPEN = "open"            # 熔断中，直接返回备用数据
+    HALF_OPEN = "half_open"  # 探测中，只放行一次调用
+
+    # 可能与具体股票有关的错误（如代码不存在时返回的数据缺少字段），不计为数据源故障，也不视为数据源正常
+    SYMBOL_ERRORS = (KeyError, ValueError, IndexError)
+    # 响应无法解析（如数据源返回维护页面或损坏的JSON），属于数据源故障；
+    # requests的JSONDecodeError同样继承自json.JSONDecodeError
+    DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout: float = BREAKER_RECOVERY_TIMEOUT,
+                 call_timeout: float = BREAKER_CALL_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.call_timeout = call_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.rejected_calls = 0
+        self.last_error = ""
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """通过熔断器调用数据接口"""
+        with self._lock:
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.recovery_timeout:
+                # 熔断时间已过，本次调用作为探测放行
+                self.state = self.HALF_OPEN
+            elif self.state != self.CLOSED:
+                self.rejected_calls += 1
+                raise CircuitOpenError(f"数据源 {self.name} 已熔断: {self.last_error}")
+
+        try:
+            result = self._run_with_timeout(func, args, kwargs)
+        except Exception as e:
+            if self._is_symbol_error(e):
+                self._on_symbol_error()
+            else:
+                self._on_failure(e)
+            raise
+
+        self._on_success()
+        return result
+
+    def _run_with_timeout(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        """在后台线程中执行调用，超过call_timeout视为失败（AKShare接口本身不支持超时设置）"""
+        outcome = {}
+
+        def target():
+            try:
+                outcome["value"] = func(*args, **kwargs)
+            except Exception as e:
+                outcome["error"] = e
+
+        worker = threading.Thread(target=target, daemon=True)
+        worker.start()
+        worker.join(self.call_timeout)
+        if worker.is_alive():
+            raise TimeoutError(f"调用超时({self.call_timeout}秒)")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("value")
+
+    def _is_symbol_error(self, error: Exception) -> bool:
+        """判断是否为股票相关的错误；由响应解析失败引起的错误（包括被包装后重新抛出的）计为数据源故障"""
+        if not isinstance(error, self.SYMBOL_ERRORS):
+            return False
+        seen = set()
+        while error is not None and id(error) not in seen:
+            if isinstance(error, self.DECODE_ERRORS):
+                return False
+            seen.add(id(error))
+            error = error.__cause__ or error.__context__
+        return True
+
+    def _on_symbol_error(self):
+        """股票相关的错误无法说明数据源是否正常: 不计入失败次数，探测中则保持熔断，由下一次调用继续探测"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def _on_success(self):
+        with self._lock:
+            recovered = self.state == self.HALF_OPEN
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+        if recovered:
+            print(f"✅ 数据源 {self.name} 已恢复")
+
+    def _on_failure(self, error: Exception):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_error = str(error) or type(error).__name__
+            if self.state == self.HALF_OPEN:
+                # 探测失败，重新计时
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                return
+            if self.state != self.CLOSED or self.consecutive_failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self.opened_at = time.time()
+        print(f"⚡ 数据源 {self.name} 连续失败{self.consecutive_failures}次，已熔断，"
+              f"{self.recovery_timeout}秒后放行一次调用进行探测")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "total_failures": self.total_failures,
+                "rejected_calls": self.rejected_calls,
+                "last_error": self.last_error
+            }
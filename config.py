@@ -15,4 +15,41 @@ DEFAULT_STOCKS = [
     {"symbol": "000001", "name": "平安银行"},
     {"symbol": "000858", "name": "五粮液"},
     {"symbol": "600519", "name": "贵州茅台"}
-]
\ No newline at end of file
+]
+# 增量分析配置 - 输入数据变化不大时复用上一次的分析结果和报告
+INCREMENTAL_MODE = True                  # 是否启用增量分析
+INCREMENTAL_CACHE_DIR = "cache"          # 分析指纹缓存目录
+INCREMENTAL_PRICE_THRESHOLD = 1.0        # 股价变动超过该百分比(%)时重新分析
+INCREMENTAL_MAX_AGE_HOURS = 24           # 上次分析超过该时长(小时)时重新分析
+
+# 分布式任务队列配置 - 多台机器/多个进程共同完成批量分析
+QUEUE_BACKEND = "sqlite"                 # 队列后端: "sqlite"(本地) 或 "redis"(生产环境)
+QUEUE_URL = "work_queue.db"              # SQLite文件路径，或Redis地址如 "redis://localhost:6379/0"
+QUEUE_LEASE_SECONDS = 600                # 任务租约时长(秒)，超时未完成的任务会被其他工作进程重新领取
+QUEUE_MAX_ATTEMPTS = 3                   # 每个任务的最大尝试次数
+QUEUE_POLL_INTERVAL = 5                  # 队列为空时的轮询间隔(秒)
+
+# 分级分析配置 - 先用低成本方式筛选全部股票，只对入选股票调用GPT-4深度分析
+TIERED_ANALYSIS = True                   # 批量分析时是否启用分级筛选
+SCREENING_MODE = "rule"                  # 筛选方式: "rule"(基于财务指标打分) 或 "llm"(低成本模型)
+SCREENING_MODEL = "gpt-3.5-turbo"        # 筛选使用的低成本模型
+SCREENING_MAX_TOKENS = 100               # 筛选回答的最大长度
+SCREENING_TOP_N = 5                      # 得分最高的前N个股票进入深度分析
+SCREENING_FLAG_PRICE_MOVE = 5.0          # 涨跌幅超过该百分比(%)的股票无论得分都进入深度分析
+
+# 模型价格（美元/千tokens，分别为输入和输出），用于估算分析成本
+MODEL_PRICING = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-3.5-turbo": (0.0005, 0.0015)
+}
+
+# 数据源熔断配置 - 数据源故障时快速失败并使用备用数据
+BREAKER_FAILURE_THRESHOLD = 3            # 连续失败多少次后熔断
+BREAKER_RECOVERY_TIMEOUT = 60            # 熔断后每隔多少秒在后台探测一次数据源
+BREAKER_CALL_TIMEOUT = 15                # 单次数据请求超时时间（秒），超时计为失败
+
+# 报告存储配置
+REPORT_STORAGE = "files"                 # "files": 每份报告单独保存; "archive": 按天打包压缩归档
+REPORT_ARCHIVE_CODEC = "gzip"            # 归档压缩格式: "gzip" 或 "zstd"（需要安装zstandard库）
+REPORT_RETENTION_DAYS = 365              # 归档保留天数，0表示永久保留
+REPORT_ROLLUP_AFTER_DAYS = 30            # 超过该天数的按天归档合并为按月归档，0表示不合并
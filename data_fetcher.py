@@ -2,6 +2,8 @@ import akshare as ak
 import pandas as pd
 from typing import Dict, List, Any
 import time
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from single_flight import SingleFlight
 
 class FinancialDataFetcher:
     """
@@ -11,30 +13,60 @@ class FinancialDataFetcher:
     
     def __init__(self):
         self.stock_data = {}
+        self.breakers = {}
+        self.single_flight = SingleFlight()
         print("✅ 数据获取器初始化完成")
     
+    def _call(self, endpoint: str, **kwargs) -> Any:
+        """
+        通过对应接口的熔断器调用AKShare，熔断期间直接抛出CircuitOpenError
+        相同接口、相同参数的请求正在进行时不再重复发起，而是共享同一次请求的结果
+        """
+        if endpoint not in self.breakers:
+            self.breakers.setdefault(endpoint, CircuitBreaker(endpoint))
+        key = (endpoint, tuple(sorted(kwargs.items())))
+        return self.single_flight.do(key, self.breakers[endpoint].call, getattr(ak, endpoint), **kwargs)
+    
+    def get_breaker_report(self) -> str:
+        """生成数据源熔断器状态摘要（只列出出现过失败的数据源）"""
+        state_names = {"closed": "正常", "open": "熔断", "half_open": "探测中"}
+        lines = []
+        for status in (breaker.get_status() for breaker in self.breakers.values()):
+            if status["total_failures"] == 0:
+                continue
+            lines.append(f"  {status['name']}: {state_names[status['state']]}, "
+                         f"失败 {status['total_failures']} 次, 快速拒绝 {status['rejected_calls']} 次"
+                         f" (最近错误: {status['last_error']})")
+        return "\n".join(lines)
+    
     def get_company_profile(self, symbol: str) -> Dict[str, Any]:
         """获取公司基本信息"""
         print(f"📋 正在获取 {symbol} 的公司信息...")
         try:
             # 尝试多种方式获取公司信息
             stock_info = {}
+            failed_sources = []
             
             # 方法1: 获取股票基本信息
             try:
-                stock_individual_info = ak.stock_individual_info_em(symbol=symbol)
+                stock_individual_info = self._call("stock_individual_info_em", symbol=symbol)
                 if not stock_individual_info.empty:
                     stock_info = stock_individual_info.iloc[0].to_dict()
             except:
-                pass
+                failed_sources.append("stock_individual_info_em")
             
             # 方法2: 获取公司概况
             try:
-                stock_profile = ak.stock_profile_cninfo(symbol=symbol)
+                stock_profile = self._call("stock_profile_cninfo", symbol=symbol)
                 if not stock_profile.empty:
                     stock_info.update(stock_profile.iloc[0].to_dict())
             except:
-                pass
+                failed_sources.append("stock_profile_cninfo")
+            
+            # 只有部分数据源成功时，标记为不完整数据
+            if stock_info and failed_sources:
+                stock_info["partial"] = True
+                stock_info["note"] = f"部分数据源不可用: {', '.join(failed_sources)}"
             
             # 如果都失败了，返回模拟数据（用于测试）
             if not stock_info:
@@ -44,7 +76,8 @@ class FinancialDataFetcher:
                     "industry": "金融",
                     "listing_date": "2020-01-01",
                     "province": "北京",
-                    "note": "模拟数据 - 实际数据获取失败"
+                    "note": "模拟数据 - 实际数据获取失败",
+                    "fallback": True
                 }
             
             return stock_info
@@ -58,7 +91,7 @@ class FinancialDataFetcher:
         print(f"💰 正在获取 {symbol} 的财务指标...")
         try:
             # 获取财务指标数据
-            financial_data = ak.stock_financial_analysis_indicator(symbol=symbol)
+            financial_data = self._call("stock_financial_analysis_indicator", symbol=symbol)
             
             if not financial_data.empty:
                 # 获取最新一期的财务数据
@@ -66,15 +99,11 @@ class FinancialDataFetcher:
                 return latest_data
             else:
                 # 返回模拟财务数据
-                return {
-                    "earnings_per_share": 2.5,
-                    "net_profit_margin": 0.15,
-                    "roe": 0.12,
-                    "debt_to_asset_ratio": 0.4,
-                    "revenue_growth": 0.08,
-                    "note": "模拟财务数据 - 实际数据获取失败"
-                }
+                return self._mock_financial_data("模拟财务数据 - 实际数据获取失败")
                 
+        except CircuitOpenError as e:
+            # 数据源熔断中，直接使用备用数据
+            return self._mock_financial_data(f"模拟财务数据 - {str(e)}")
         except Exception as e:
             print(f"❌ 获取财务指标失败: {str(e)}")
             return {"error": f"获取财务指标失败: {str(e)}"}
@@ -84,7 +113,7 @@ class FinancialDataFetcher:
         print(f"📈 正在获取 {symbol} 的股价数据...")
         try:
             # 获取历史股价数据
-            price_data = ak.stock_zh_a_hist(symbol=symbol, period=period, adjust="")
+            price_data = self._call("stock_zh_a_hist", symbol=symbol, period=period, adjust="")
             
             if not price_data.empty and len(price_data) > 1:
                 # 计算价格变动
@@ -100,18 +129,38 @@ class FinancialDataFetcher:
                 }
             else:
                 # 返回模拟股价数据
-                return {
-                    "latest_price": 50.0,
-                    "price_change_percent": 1.5,
-                    "data_period": "模拟数据",
-                    "volume": 1000000,
-                    "note": "模拟股价数据 - 实际数据获取失败"
-                }
+                return self._mock_price_data("模拟股价数据 - 实际数据获取失败")
                 
+        except CircuitOpenError as e:
+            # 数据源熔断中，直接使用备用数据
+            return self._mock_price_data(f"模拟股价数据 - {str(e)}")
         except Exception as e:
             print(f"❌ 获取股价数据失败: {str(e)}")
             return {"error": f"获取股价数据失败: {str(e)}"}
     
+    def _mock_financial_data(self, note: str) -> Dict[str, Any]:
+        """模拟财务数据（数据源不可用时的备用数据）"""
+        return {
+            "earnings_per_share": 2.5,
+            "net_profit_margin": 0.15,
+            "roe": 0.12,
+            "debt_to_asset_ratio": 0.4,
+            "revenue_growth": 0.08,
+            "note": note,
+            "fallback": True
+        }
+    
+    def _mock_price_data(self, note: str) -> Dict[str, Any]:
+        """模拟股价数据（数据源不可用时的备用数据）"""
+        return {
+            "latest_price": 50.0,
+            "price_change_percent": 1.5,
+            "data_period": "模拟数据",
+            "volume": 1000000,
+            "note": note,
+            "fallback": True
+        }
+    
     def get_macro_data(self) -> Dict[str, Any]:
         """获取宏观经济数据"""
         print("🌍 正在获取宏观经济数据...")
@@ -120,27 +169,27 @@ class FinancialDataFetcher:
             
             # 获取CPI数据
             try:
-                cpi_data = ak.macro_china_cpi()
+                cpi_data = self._call("macro_china_cpi")
                 if not cpi_data.empty:
                     macro_data["cpi"] = cpi_data.iloc[-1].to_dict()
             except:
-                macro_data["cpi"] = {"value": 2.5, "note": "模拟CPI数据"}
+                macro_data["cpi"] = {"value": 2.5, "note": "模拟CPI数据", "fallback": True}
             
             # 获取PMI数据
             try:
-                pmi_data = ak.macro_china_pmi()
+                pmi_data = self._call("macro_china_pmi")
                 if not pmi_data.empty:
                     macro_data["pmi"] = pmi_data.iloc[-1].to_dict()
             except:
-                macro_data["pmi"] = {"value": 50.5, "note": "模拟PMI数据"}
+                macro_data["pmi"] = {"value": 50.5, "note": "模拟PMI数据", "fallback": True}
             
             return macro_data
             
         except Exception as e:
             print(f"❌ 获取宏观数据失败: {str(e)}")
             return {
-                "cpi": {"value": 2.5, "note": "模拟数据"},
-                "pmi": {"value": 50.5, "note": "模拟数据"},
+                "cpi": {"value": 2.5, "note": "模拟数据", "fallback": True},
+                "pmi": {"value": 50.5, "note": "模拟数据", "fallback": True},
                 "error": f"获取宏观数据失败: {str(e)}"
             }
     
@@ -1,8 +1,13 @@
 import openai
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import json
+import re
+import threading
 import time
+from single_flight import SingleFlight
 from config import OPENAI_API_KEY, OPENAI_MODEL, REQUEST_TIMEOUT, MAX_TOKENS
+from config import (SCREENING_MODE, SCREENING_MODEL, SCREENING_MAX_TOKENS,
+                    SCREENING_TOP_N, SCREENING_FLAG_PRICE_MOVE, MODEL_PRICING)
 
 class OpenAIAnalyst:
     """
@@ -25,6 +30,18 @@ class OpenAIAnalyst:
         self.timeout = REQUEST_TIMEOUT
         self.max_tokens = MAX_TOKENS
         self.analysis_history = []
+        
+        # 分级分析配置
+        self.screening_mode = SCREENING_MODE
+        self.screening_model = SCREENING_MODEL
+        self.screening_top_n = SCREENING_TOP_N
+        self.tier_stats = {}
+        self._counted_responses = set()
+        
+        # 相同模型、相同提示词的请求正在进行时合并为一次调用
+        self.single_flight = SingleFlight()
+        # 按线程记录最近一次深度分析是否得到了模型的真实结果
+        self._last_analysis = threading.local()
         print("✅ OpenAI分析器初始化完成")
     
     def analyze_company(self, company_data: Dict, financial_data: Dict, 
@@ -37,13 +54,18 @@ class OpenAIAnalyst:
         prompt = self._build_analysis_prompt(company_data, financial_data, 
                                            price_data, macro_data)
         
+        start_time = time.time()
+        response = None
+        self._last_analysis.succeeded = False
         try:
             # 检查API密钥是否已配置
             if not OPENAI_API_KEY or OPENAI_API_KEY.startswith("sk-your-"):
                 return self._get_mock_analysis()
             
             # 调用OpenAI API - 使用新版本的方式
-            response = self.client.chat.completions.create(
+            response = self.single_flight.do(
+                (self.model, prompt),
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {
@@ -63,6 +85,7 @@ class OpenAIAnalyst:
             )
             
             analysis_result = response.choices[0].message.content
+            self._last_analysis.succeeded = True
             print("✅ OpenAI分析完成!")
             return analysis_result
             
@@ -85,6 +108,168 @@ class OpenAIAnalyst:
             error_msg = f"❌ 分析过程中出现未知错误: {str(e)}"
             print(error_msg)
             return f"{error_msg}\n\n{self._get_mock_analysis()}"
+        
+        finally:
+            self._record_usage("deep", self.model, time.time() - start_time, response)
+    
+    def last_analysis_succeeded(self) -> bool:
+        """当前线程最近一次 analyze_company 是否成功调用了模型（失败时返回的是错误提示和模拟分析结果）"""
+        return getattr(self._last_analysis, "succeeded", False)
+    
+    def screen_company(self, company_data: Dict, financial_data: Dict,
+                       price_data: Dict, macro_data: Dict) -> Dict[str, Any]:
+        """快速筛选: 用规则打分或低成本模型给出0-100的评分"""
+        start_time = time.time()
+        screening = self._rule_based_score(financial_data, price_data)
+        
+        if self.screening_mode == "llm" and OPENAI_API_KEY and not OPENAI_API_KEY.startswith("sk-your-"):
+            response = None
+            try:
+                prompt = self._build_screening_prompt(company_data, financial_data, price_data)
+                response = self.single_flight.do(
+                    (self.screening_model, prompt),
+                    self.client.chat.completions.create,
+                    model=self.screening_model,
+                    messages=[
+                        {"role": "system", "content": "你是一名金融分析师，负责快速筛选值得深入研究的股票。"},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0,
+                    max_tokens=SCREENING_MAX_TOKENS,
+                    timeout=self.timeout
+                )
+                content = response.choices[0].message.content or ""
+                match = re.search(r"\d+(\.\d+)?", content)
+                if match:
+                    screening = {
+                        "score": max(0.0, min(100.0, float(match.group()))),
+                        "reason": content.strip(),
+                        "method": self.screening_model
+                    }
+            except Exception as e:
+                print(f"❌ 模型筛选失败，改用规则打分: {str(e)}")
+            finally:
+                self._record_usage("screen", self.screening_model, time.time() - start_time, response)
+        else:
+            self._record_usage("screen", "rule", time.time() - start_time)
+        
+        change = self._to_number(price_data.get("price_change_percent"))
+        screening["flagged"] = change is not None and abs(change) >= SCREENING_FLAG_PRICE_MOVE
+        return screening
+    
+    def select_for_deep_analysis(self, screenings: Dict[str, Dict[str, Any]],
+                                 top_n: Optional[int] = None) -> List[str]:
+        """根据筛选结果选出进入深度分析的股票（得分前N名 + 被标记的股票）"""
+        top_n = self.screening_top_n if top_n is None else top_n
+        ranked = sorted(screenings, key=lambda symbol: screenings[symbol]["score"], reverse=True)
+        selected = set(ranked[:top_n])
+        selected.update(symbol for symbol, item in screenings.items() if item.get("flagged"))
+        return [symbol for symbol in ranked if symbol in selected]
+    
+    def _build_screening_prompt(self, company_data: Dict, financial_data: Dict, price_data: Dict) -> str:
+        """构建筛选提示词（尽量简短以降低成本）"""
+        return f"""根据以下数据，给该股票的投资研究价值打分(0-100)。
+只输出一行，格式: 分数|一句话理由
+
+公司: {company_data.get('company_name', company_data.get('symbol', ''))}
+财务指标:
+{self._format_data(financial_data)}
+股价:
+{self._format_data(price_data)}
+"""
+    
+    def _rule_based_score(self, financial_data: Dict, price_data: Dict) -> Dict[str, Any]:
+        """基于已获取的财务指标和股价表现进行规则打分"""
+        roe = self._get_percent_metric(financial_data, ["净资产收益率(%)", "加权净资产收益率(%)", "roe"])
+        margin = self._get_percent_metric(financial_data, ["销售净利率(%)", "net_profit_margin"])
+        growth = self._get_percent_metric(financial_data, ["主营业务收入增长率(%)", "revenue_growth"])
+        debt = self._get_percent_metric(financial_data, ["资产负债率(%)", "debt_to_asset_ratio"])
+        change = self._to_number(price_data.get("price_change_percent"))
+        
+        score = 50.0
+        reasons = []
+        if roe is not None:
+            score += max(-20, min(20, (roe - 10) * 2))
+            reasons.append(f"ROE {roe:.1f}%")
+        if margin is not None:
+            score += max(-10, min(10, margin - 10))
+            reasons.append(f"净利率 {margin:.1f}%")
+        if growth is not None:
+            score += max(-15, min(15, growth / 2))
+            reasons.append(f"营收增长 {growth:.1f}%")
+        if debt is not None:
+            score -= max(0, min(15, (debt - 60) / 2))
+            reasons.append(f"负债率 {debt:.1f}%")
+        if change is not None:
+            score += max(-5, min(5, change))
+            reasons.append(f"涨跌幅 {change:.2f}%")
+        
+        return {
+            "score": round(max(0.0, min(100.0, score)), 1),
+            "reason": "，".join(reasons) or "缺少可用指标",
+            "method": "rule"
+        }
+    
+    def _get_percent_metric(self, data: Dict, keys: List[str]) -> Optional[float]:
+        """按候选字段名读取百分比指标（模拟数据使用小数形式，统一换算为百分数）"""
+        for key in keys:
+            value = self._to_number(data.get(key))
+            if value is not None:
+                return value if key.endswith("(%)") else value * 100
+        return None
+    
+    def _to_number(self, value: Any) -> Optional[float]:
+        """将AKShare返回的数值（可能是字符串或'--'）转换为浮点数"""
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        return None if number != number else number  # 过滤NaN
+    
+    def _record_usage(self, tier: str, model: str, elapsed: float, response: Any = None):
+        """记录各层级的调用次数、耗时、token用量和估算成本"""
+        stats = self.tier_stats.setdefault(tier, {
+            "model": model, "calls": 0, "seconds": 0.0, "tokens": 0, "cost": 0.0,
+            "symbols": 0, "wall_seconds": 0.0
+        })
+        stats["calls"] += 1
+        stats["seconds"] += elapsed
+        usage = getattr(response, "usage", None)
+        # 合并的请求共享同一个响应，token和成本只统计一次
+        response_id = getattr(response, "id", None)
+        if response_id in self._counted_responses:
+            return
+        if response_id:
+            self._counted_responses.add(response_id)
+        if usage:
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+            input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+            stats["tokens"] += prompt_tokens + completion_tokens
+            stats["cost"] += (prompt_tokens * input_price + completion_tokens * output_price) / 1000
+    
+    def record_stage(self, tier: str, symbols: int, wall_seconds: float):
+        """记录一个分析阶段处理的股票数量和实际经过的时间（用于计算吞吐量）"""
+        stats = self.tier_stats.get(tier)
+        if stats is None:
+            return
+        stats["symbols"] += symbols
+        stats["wall_seconds"] += wall_seconds
+    
+    def get_tier_report(self) -> str:
+        """生成分级分析的吞吐量、成本和各层级耗时统计"""
+        tier_names = {"screen": "快速筛选", "deep": "深度分析"}
+        lines = []
+        for tier, stats in self.tier_stats.items():
+            calls = stats["calls"]
+            avg_latency = stats["seconds"] / calls if calls else 0
+            line = f"{tier_names.get(tier, tier)}({stats['model']}): {calls}次, 平均耗时 {avg_latency:.2f}秒, "
+            # 吞吐量按阶段实际经过的时间计算（包含数据获取等开销），而不是模型调用耗时之和
+            if stats["wall_seconds"]:
+                line += (f"吞吐量 {stats['symbols'] / stats['wall_seconds']:.2f}个/秒 "
+                         f"({stats['symbols']}个/{stats['wall_seconds']:.1f}秒), ")
+            lines.append(line + f"tokens {stats['tokens']}, 估算成本 ${stats['cost']:.4f}")
+        return "\n".join(lines)
     
     def _build_analysis_prompt(self, company_data: Dict, financial_data: Dict,
                              price_data: Dict, macro_data: Dict) -> str:
@@ -6,11 +6,12 @@
 
 import time
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 # 导入自定义模块
-from config import OPENAI_API_KEY, DEFAULT_STOCKS
+from config import OPENAI_API_KEY, DEFAULT_STOCKS, INCREMENTAL_MODE, TIERED_ANALYSIS
+from analysis_cache import AnalysisCache
 from data_fetcher import FinancialDataFetcher
 from llm_analyst import OpenAIAnalyst
 from report_generator import ReportGenerator
@@ -28,6 +29,7 @@ class InvestmentResearchAssistant:
         self.data_fetcher = FinancialDataFetcher()
         self.analyst = OpenAIAnalyst()
         self.report_generator = ReportGenerator()
+        self.analysis_cache = AnalysisCache(report_exists=self.report_generator.report_exists) if INCREMENTAL_MODE else None
         
         # 存储分析历史
         self.analysis_history = []
@@ -39,8 +41,10 @@ class InvestmentResearchAssistant:
         else:
             print(f"📝 配置信息: OpenAI模型={self.analyst.model}, 输出目录=reports")
     
-    def analyze_single_stock(self, symbol: str, company_name: str = "") -> Dict[str, Any]:
-        """分析单个股票"""
+    def analyze_single_stock(self, symbol: str, company_name: str = "", force: bool = False,
+                             raw_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """分析单个股票，增量模式下输入数据变化不大时复用上一次的分析（force=True时强制重新分析）
+        raw_data: 已获取的数据（分级分析时由筛选阶段传入，避免重复获取）"""
         print(f"\n{'='*50}")
         print(f"开始分析: {symbol} {company_name}")
         print(f"{'='*50}")
@@ -49,7 +53,27 @@ class InvestmentResearchAssistant:
         
         try:
             # 1. 获取数据
-            raw_data = self.data_fetcher.get_all_data(symbol)
+            if raw_data is None:
+                raw_data = self.data_fetcher.get_all_data(symbol)
+            
+            # 增量模式: 输入数据变化低于阈值时直接复用上一次的分析和报告
+            if self.analysis_cache and not force:
+                record, reason = self.analysis_cache.check(symbol, raw_data)
+                if record:
+                    result = {
+                        "symbol": symbol,
+                        "company_name": company_name or record.get("company_name", ""),
+                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "raw_data": raw_data,
+                        "analysis": record["analysis"],
+                        "report_paths": record["report_paths"],
+                        "reused": True,
+                        "reused_from": record["timestamp"]
+                    }
+                    self.analysis_history.append(result)
+                    print(f"♻️ {reason}，复用 {record['timestamp']} 的分析结果")
+                    return result
+                print(f"🔄 需要重新分析: {reason}")
             
             # 2. AI分析
             analysis_result = self.analyst.analyze_company(
@@ -65,7 +89,8 @@ class InvestmentResearchAssistant:
                 "company_name": company_name or raw_data["company_data"].get("company_name", ""),
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "raw_data": raw_data,
-                "analysis": analysis_result
+                "analysis": analysis_result,
+                "model": self.analyst.model
             }
             
             # 4. 生成报告
@@ -79,6 +104,12 @@ class InvestmentResearchAssistant:
             
             # 5. 保存到历史
             self.analysis_history.append(result)
+            if self.analysis_cache:
+                # 模型调用失败时的错误提示和模拟分析不写入缓存，下次运行重新分析
+                if self.analyst.last_analysis_succeeded():
+                    self.analysis_cache.save(result)
+                else:
+                    print("⚠️ 本次未获得模型分析结果，不写入增量分析缓存")
             
             elapsed_time = time.time() - start_time
             print(f"✅ 分析完成! 耗时: {elapsed_time:.2f}秒")
@@ -96,27 +127,127 @@ class InvestmentResearchAssistant:
             }
     
     def analyze_multiple_stocks(self, stock_list: List[Dict[str, str]]) -> List[Dict[str, Any]]:
-        """批量分析多个股票"""
-        print(f"\n📊 开始批量分析 {len(stock_list)} 个股票...")
+        """批量分析多个股票（重复的股票只分析一次，返回的结果仍与输入列表一一对应）"""
+        unique_stocks = self._deduplicate_stocks(stock_list)
+        print(f"\n📊 开始批量分析 {len(unique_stocks)} 个股票...")
+        if len(unique_stocks) < len(stock_list):
+            print(f"🔁 已去除 {len(stock_list) - len(unique_stocks)} 个重复股票")
         
-        results = []
-        for i, stock in enumerate(stock_list, 1):
-            print(f"\n[{i}/{len(stock_list)}] 分析 {stock['symbol']} - {stock.get('name', '')}")
-            
-            result = self.analyze_single_stock(stock['symbol'], stock.get('name', ''))
-            results.append(result)
-            
-            # 添加延迟，避免请求过于频繁
-            if i < len(stock_list):
-                print("⏳ 等待3秒后继续...")
-                time.sleep(3)
+        # 股票数量超过深度分析名额时，先快速筛选再深度分析
+        if TIERED_ANALYSIS and len(unique_stocks) > self.analyst.screening_top_n:
+            results = self._analyze_tiered(unique_stocks)
+        else:
+            results = []
+            for i, stock in enumerate(unique_stocks, 1):
+                print(f"\n[{i}/{len(unique_stocks)}] 分析 {stock['symbol']} - {stock.get('name', '')}")
+                
+                result = self.analyze_single_stock(stock['symbol'], stock.get('name', ''))
+                results.append(result)
+                
+                # 添加延迟，避免请求过于频繁
+                if i < len(unique_stocks):
+                    print("⏳ 等待3秒后继续...")
+                    time.sleep(3)
         
         # 生成对比报告
         if len(results) > 1:
             self.report_generator.generate_comparison_report(results)
         
+        self.print_run_summary(results)
+        
+        # 按原始输入顺序返回，重复的股票共享同一个结果
+        results_by_symbol = {result['symbol']: result for result in results}
+        return [results_by_symbol[stock['symbol'].strip()] for stock in stock_list]
+    
+    def _deduplicate_stocks(self, stock_list: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """按股票代码去重，保留首次出现的顺序（名称为空时使用重复项中的名称）"""
+        unique_stocks = {}
+        for stock in stock_list:
+            symbol = stock['symbol'].strip()
+            if symbol not in unique_stocks:
+                unique_stocks[symbol] = {"symbol": symbol, "name": stock.get('name', '')}
+            elif not unique_stocks[symbol]["name"]:
+                unique_stocks[symbol]["name"] = stock.get('name', '')
+        return list(unique_stocks.values())
+    
+    def _analyze_tiered(self, stock_list: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """分级分析: 获取全部数据并快速筛选，只对入选股票进行深度分析"""
+        print(f"\n🔎 第一阶段: 快速筛选 {len(stock_list)} 个股票 (方式: {self.analyst.screening_mode})")
+        
+        all_data = {}
+        screenings = {}
+        stage_start = time.time()
+        for i, stock in enumerate(stock_list, 1):
+            symbol = stock['symbol']
+            try:
+                raw_data = self.data_fetcher.get_all_data(symbol)
+                all_data[symbol] = raw_data
+                screenings[symbol] = self.analyst.screen_company(
+                    raw_data["company_data"],
+                    raw_data["financial_data"],
+                    raw_data["price_data"],
+                    raw_data["macro_data"]
+                )
+                flag = " 🚩" if screenings[symbol]["flagged"] else ""
+                print(f"[{i}/{len(stock_list)}] {symbol} 评分: {screenings[symbol]['score']}{flag}")
+            except Exception as e:
+                print(f"❌ 获取 {symbol} 的数据时出现错误: {str(e)}")
+        self.analyst.record_stage("screen", len(screenings), time.time() - stage_start)
+        
+        selected = self.analyst.select_for_deep_analysis(screenings)
+        print(f"\n🧠 第二阶段: 深度分析 {len(selected)} 个入选股票: {', '.join(selected)}")
+        
+        results = []
+        deep_count = 0
+        stage_start = time.time()
+        for stock in stock_list:
+            symbol = stock['symbol']
+            if symbol not in all_data:
+                results.append({
+                    "symbol": symbol,
+                    "company_name": stock.get('name', ''),
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "error": "数据获取失败",
+                    "analysis": "分析过程中出现错误: 数据获取失败"
+                })
+            elif symbol in selected:
+                result = self.analyze_single_stock(symbol, stock.get('name', ''), raw_data=all_data[symbol])
+                result["screening"] = screenings[symbol]
+                results.append(result)
+                deep_count += 1
+            else:
+                screening = screenings[symbol]
+                results.append({
+                    "symbol": symbol,
+                    "company_name": stock.get('name', '') or all_data[symbol]["company_data"].get("company_name", ""),
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "raw_data": all_data[symbol],
+                    "analysis": f"【快速筛选未入选深度分析】评分: {screening['score']} ({screening['method']})\n"
+                                f"依据: {screening['reason']}",
+                    "screening": screening,
+                    "screened_out": True
+                })
+        self.analyst.record_stage("deep", deep_count, time.time() - stage_start)
         return results
     
+    def print_run_summary(self, results: List[Dict[str, Any]]):
+        """显示本次批量运行的摘要"""
+        skipped = sum(1 for r in results if r.get("reused"))
+        screened_out = sum(1 for r in results if r.get("screened_out"))
+        failed = sum(1 for r in results if "error" in r)
+        analyzed = len(results) - skipped - screened_out - failed
+        print(f"\n📋 运行摘要: 共 {len(results)} 个股票, "
+              f"完整分析 {analyzed} 个, 复用跳过 {skipped} 个, 筛选未入选 {screened_out} 个, 失败 {failed} 个")
+        tier_report = self.analyst.get_tier_report()
+        if tier_report:
+            print(tier_report)
+        coalesced = self.data_fetcher.single_flight.coalesced + self.analyst.single_flight.coalesced
+        if coalesced:
+            print(f"🔗 合并重复的进行中请求 {coalesced} 次")
+        breaker_report = self.data_fetcher.get_breaker_report()
+        if breaker_report:
+            print(f"⚡ 数据源熔断状态:\n{breaker_report}")
+    
     def display_analysis_result(self, result: Dict[str, Any]):
         """在控制台显示分析结果"""
         print(f"\n{'='*60}")
@@ -222,6 +353,7 @@ def main():
     
     # 创建助手实例
     assistant = InvestmentResearchAssistant()
+    assistant.report_generator.apply_retention()
     
     # 运行交互模式
     assistant.run_interactive_mode()
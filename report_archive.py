@@ -0,0 +1,287 @@
+import gzip
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from config import (REPORT_STORAGE, REPORT_ARCHIVE_CODEC, REPORT_RETENTION_DAYS,
+                    REPORT_ROLLUP_AFTER_DAYS)
+
+class FileReportStorage:
+    """默认报告存储: 每份报告保存为单独的文件"""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+
+    def save(self, filename: str, content: str) -> str:
+        filepath = os.path.join(self.output_dir, filename)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return filepath
+
+    def read(self, locator: str) -> Optional[str]:
+        if not os.path.exists(locator):
+            return None
+        with open(locator, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def exists(self, locator: str) -> bool:
+        return os.path.exists(locator)
+
+    def list_reports(self) -> List[str]:
+        """列出报告目录中所有报告的路径"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        return [os.path.join(self.output_dir, filename) for filename in sorted(os.listdir(self.output_dir))
+                if filename.startswith("research_report_")]
+
+    def apply_retention(self) -> List[str]:
+        """单文件存储不做清理"""
+        return []
+
+
+class ArchiveReportStorage:
+    """
+    压缩归档报告存储
+    同一天的报告逐份压缩后追加到一个归档文件(.pack)，并在索引文件(.idx)中记录偏移量，
+    读取单份报告时只需定位并解压对应的片段；较旧的按天归档会合并为按月归档，超过保留期限的归档会被删除
+    """
+
+    ARCHIVE_PREFIX = "archive://"
+    # 报告文件名中的生成时间，如 research_report_000001_20240101_093000.txt
+    DATE_PATTERN = re.compile(r"_(\d{8})_\d{6}\.")
+
+    def __init__(self, output_dir: str, codec: str = REPORT_ARCHIVE_CODEC,
+                 retention_days: int = REPORT_RETENTION_DAYS,
+                 rollup_after_days: int = REPORT_ROLLUP_AFTER_DAYS):
+        if codec == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("使用zstd压缩需要先安装zstandard库: pip install zstandard")
+        elif codec != "gzip":
+            raise ValueError(f"不支持的压缩格式: {codec}")
+
+        self.output_dir = output_dir
+        self.archive_dir = os.path.join(output_dir, "archive")
+        self.codec = codec
+        self.retention_days = retention_days
+        self.rollup_after_days = rollup_after_days
+        self._index_cache = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            import zstandard
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data)
+
+    def _decompress(self, data: bytes, codec: str) -> bytes:
+        if codec == "zstd":
+            import zstandard
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def _archive_path(self, period: str) -> str:
+        """period为YYYYMMDD(按天)或YYYYMM(按月)"""
+        return os.path.join(self.archive_dir, f"reports_{period}.pack")
+
+    @contextmanager
+    def _archive_lock(self):
+        """
+        归档写锁: 线程锁 + 文件锁，多个工作进程共用同一报告目录时也能保证追加和合并互斥
+        （不可重入，_append 由调用方在持有锁时调用）
+        """
+        with self._lock, open(os.path.join(self.archive_dir, ".lock"), 'a+b') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _append(self, archive_path: str, name: str, blob: bytes, codec: str):
+        """将一个压缩片段追加到归档文件，并记录索引（调用方需持有归档写锁）"""
+        with open(archive_path, 'ab') as f:
+            # 持锁时以文件实际大小作为偏移量，不依赖打开时的位置
+            offset = os.fstat(f.fileno()).st_size
+            f.write(blob)
+        with open(archive_path + ".idx", 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"name": name, "offset": offset, "length": len(blob),
+                                "codec": codec}, ensure_ascii=False) + "\n")
+
+    def _load_index(self, archive_path: str) -> Dict[str, Dict[str, Any]]:
+        """读取归档索引（按文件大小缓存，归档追加后自动重新加载）"""
+        idx_path = archive_path + ".idx"
+        if not os.path.exists(idx_path):
+            return {}
+        size = os.path.getsize(idx_path)
+        cached = self._index_cache.get(idx_path)
+        if cached and cached[0] == size:
+            return cached[1]
+        entries = {}
+        with open(idx_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["name"]] = entry
+        self._index_cache[idx_path] = (size, entries)
+        return entries
+
+    def save(self, filename: str, content: str) -> str:
+        match = self.DATE_PATTERN.search(filename)
+        day = match.group(1) if match else datetime.now().strftime("%Y%m%d")
+        blob = self._compress(content.encode("utf-8"))
+        with self._archive_lock():
+            self._append(self._archive_path(day), filename, blob, self.codec)
+        return self.ARCHIVE_PREFIX + filename
+
+    def _locate(self, name: str):
+        """查找报告所在的归档（先查按天归档，再查合并后的按月归档）"""
+        match = self.DATE_PATTERN.search(name)
+        if not match:
+            return None, None
+        day = match.group(1)
+        for archive_path in (self._archive_path(day), self._archive_path(day[:6])):
+            entry = self._load_index(archive_path).get(name)
+            if entry:
+                return archive_path, entry
+        return None, None
+
+    def read(self, locator: str) -> Optional[str]:
+        if not locator.startswith(self.ARCHIVE_PREFIX):
+            # 切换存储方式之前生成的单独报告文件
+            return FileReportStorage(os.path.dirname(locator)).read(locator)
+        archive_path, entry = self._locate(locator[len(self.ARCHIVE_PREFIX):])
+        if entry is None:
+            return None
+        with open(archive_path, 'rb') as f:
+            f.seek(entry["offset"])
+            blob = f.read(entry["length"])
+        return self._decompress(blob, entry["codec"]).decode("utf-8")
+
+    def exists(self, locator: str) -> bool:
+        if not locator.startswith(self.ARCHIVE_PREFIX):
+            return os.path.exists(locator)
+        return self._locate(locator[len(self.ARCHIVE_PREFIX):])[1] is not None
+
+    def list_reports(self) -> List[str]:
+        """列出所有报告: 切换存储方式之前生成的单独报告文件，以及各归档中的报告"""
+        reports = FileReportStorage(self.output_dir).list_reports()
+        for archive in self.list_archives():
+            reports.extend(self.ARCHIVE_PREFIX + name for name in self._load_index(archive["path"]))
+        return reports
+
+    def list_archives(self) -> List[Dict[str, Any]]:
+        """列出所有归档及其报告数量和大小"""
+        archives = []
+        for filename in sorted(os.listdir(self.archive_dir)):
+            match = re.fullmatch(r"reports_(\d{6}|\d{8})\.pack", filename)
+            if not match:
+                continue
+            archive_path = os.path.join(self.archive_dir, filename)
+            archives.append({
+                "period": match.group(1),
+                "path": archive_path,
+                "reports": len(self._load_index(archive_path)),
+                "size": os.path.getsize(archive_path)
+            })
+        return archives
+
+    def _remove(self, archive_path: str):
+        for path in (archive_path, archive_path + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+        self._index_cache.pop(archive_path + ".idx", None)
+
+    def apply_retention(self) -> List[str]:
+        """
+        执行合并和保留策略: 按天归档超过rollup_after_days天后合并为按月归档，
+        超过retention_days天的归档被删除；返回被删除报告的路径，供清理索引使用
+        """
+        today = datetime.now()
+        rollup_cutoff = (today - timedelta(days=self.rollup_after_days)).strftime("%Y%m%d")
+        retention_cutoff = None
+        if self.retention_days > 0:
+            retention_cutoff = (today - timedelta(days=self.retention_days)).strftime("%Y%m%d")
+
+        deleted = []
+        with self._archive_lock():
+            for archive in self.list_archives():
+                period = archive["period"]
+                # 按月归档以当月最后一天判断是否过期
+                last_day = period if len(period) == 8 else period + "31"
+                if retention_cutoff and last_day < retention_cutoff:
+                    deleted.extend(self.ARCHIVE_PREFIX + name for name in self._load_index(archive["path"]))
+                    self._remove(archive["path"])
+                    print(f"🗑️ 已删除过期归档: {archive['path']}")
+                    continue
+
+                if len(period) == 8 and self.rollup_after_days > 0 and period < rollup_cutoff:
+                    monthly_path = self._archive_path(period[:6])
+                    existing = self._load_index(monthly_path)
+                    with open(archive["path"], 'rb') as f:
+                        for entry in self._load_index(archive["path"]).values():
+                            if entry["name"] in existing:
+                                continue
+                            f.seek(entry["offset"])
+                            self._append(monthly_path, entry["name"], f.read(entry["length"]),
+                                         entry["codec"])
+                    self._remove(archive["path"])
+                    print(f"📦 已将 {period} 的归档合并至: {monthly_path}")
+
+        return deleted
+
+
+def create_report_storage(output_dir: str, backend: str = REPORT_STORAGE):
+    """根据配置创建报告存储"""
+    if backend == "files":
+        return FileReportStorage(output_dir)
+    if backend == "archive":
+        return ArchiveReportStorage(output_dir)
+    raise ValueError(f"不支持的报告存储方式: {backend}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="智能投研助手 - 报告归档")
+    parser.add_argument("--dir", default="reports", help="报告目录")
+    parser.add_argument("--read", help="读取单份报告，如 archive://research_report_000001_20240101_093000.txt")
+    parser.add_argument("--apply-retention", action="store_true", help="执行合并和保留策略")
+    args = parser.parse_args()
+
+    storage = ArchiveReportStorage(args.dir)
+    if args.read:
+        content = storage.read(args.read)
+        print(content if content is not None else f"❌ 未找到报告: {args.read}")
+    elif args.apply_retention:
+        deleted_paths = storage.apply_retention()
+        if deleted_paths:
+            from report_index import ReportIndex
+            deleted = ReportIndex(os.path.join(args.dir, "report_index.db")).delete_paths(deleted_paths)
+            print(f"🗑️ 已清理 {deleted} 条过期索引")
+    else:
+        for archive in storage.list_archives():
+            print(f"{archive['period']}  {archive['reports']} 份报告  "
+                  f"{archive['size'] / 1024:.1f} KB  {archive['path']}")
@@ -1,7 +1,11 @@
+import io
 import os
 from datetime import datetime
 import markdown
 from typing import Dict, List, Any
+from report_index import ReportIndex
+from analysis_cache import get_degraded_sections
+from report_archive import create_report_storage
 
 class ReportGenerator:
     """报告生成类 - 支持Markdown渲染"""
@@ -9,6 +13,8 @@ class ReportGenerator:
     def __init__(self, output_dir: str = "reports"):
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
+        self.index = ReportIndex(os.path.join(output_dir, "report_index.db"))
+        self.storage = create_report_storage(output_dir)
         print(f"✅ 报告生成器初始化完成，输出目录: {output_dir}")
     
     def _render_markdown_to_html(self, markdown_text: str) -> str:
@@ -19,14 +25,24 @@ class ReportGenerator:
         except Exception:
             return f"<pre>{markdown_text}</pre>"
     
+    def _get_fallback_sections(self, result: Dict[str, Any]) -> List[str]:
+        """找出数据不完整的部分: 使用了备用/模拟数据、只获取到部分数据或获取失败（数据源不可用或已熔断）"""
+        section_names = {
+            "company_data": "公司信息",
+            "financial_data": "财务指标",
+            "price_data": "股价数据",
+            "macro_data": "宏观数据"
+        }
+        degraded = get_degraded_sections(result.get("raw_data", {}))
+        return [name for key, name in section_names.items() if key in degraded]
+    
     def generate_text_report(self, result: Dict[str, Any]) -> str:
         """生成文本格式报告"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"research_report_{result['symbol']}_{timestamp}.txt"
-        filepath = os.path.join(self.output_dir, filename)
-        
+
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
+            with io.StringIO() as f:
                 f.write("=" * 60 + "\n")
                 f.write("           智能投研助手 - 投资分析报告\n")
                 f.write("=" * 60 + "\n\n")
@@ -37,6 +53,10 @@ class ReportGenerator:
                 f.write(f"公司名称: {result.get('company_name', 'N/A')}\n")
                 f.write(f"分析时间: {result['timestamp']}\n\n")
                 
+                fallback_sections = self._get_fallback_sections(result)
+                if fallback_sections:
+                    f.write(f"⚠️ 注意: 以下数据源不可用，数据不完整或使用了备用/模拟数据: {', '.join(fallback_sections)}\n\n")
+                
                 f.write("🤖 AI分析结果\n")
                 f.write("-" * 30 + "\n")
                 f.write(result['analysis'])
@@ -46,7 +66,10 @@ class ReportGenerator:
                 f.write("数据来源: AKShare | 分析模型: GPT-4\n")
                 f.write("注: 本报告仅供参考，不构成投资建议\n")
                 f.write("=" * 60 + "\n")
+                content = f.getvalue()
             
+            filepath = self.storage.save(filename, content)
+            self.index.add(result, text_path=filepath)
             print(f"✅ 文本报告已保存至: {filepath}")
             return filepath
         except Exception as e:
@@ -57,11 +80,16 @@ class ReportGenerator:
         """生成HTML格式报告 - 支持Markdown渲染"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"research_report_{result['symbol']}_{timestamp}.html"
-        filepath = os.path.join(self.output_dir, filename)
-        
+
         try:
             analysis_html = self._render_markdown_to_html(result['analysis'])
             
+            fallback_sections = self._get_fallback_sections(result)
+            fallback_html = ""
+            if fallback_sections:
+                fallback_html = (f'<div class="fallback-warning">⚠️ 注意: 以下数据源不可用，'
+                                 f'数据不完整或使用了备用/模拟数据: {", ".join(fallback_sections)}</div>')
+            
             html_content = f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -139,6 +167,14 @@ class ReportGenerator:
             border-radius: 3px;
             font-family: 'Courier New', monospace;
         }}
+        .fallback-warning {{
+            background: #fff3cd;
+            color: #856404;
+            border-left: 4px solid #ffc107;
+            padding: 12px 20px;
+            margin-top: 15px;
+            border-radius: 8px;
+        }}
         .footer {{
             background: #343a40;
             color: white;
@@ -160,6 +196,7 @@ class ReportGenerator:
                 <div class="info-item"><strong>公司名称</strong><br>{result.get('company_name', 'N/A')}</div>
                 <div class="info-item"><strong>分析时间</strong><br>{result['timestamp']}</div>
             </div>
+            {fallback_html}
         </div>
         
         <div class="analysis-section">
@@ -175,11 +212,87 @@ class ReportGenerator:
 </body>
 </html>"""
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            filepath = self.storage.save(filename, html_content)
             
+            self.index.add(result, html_path=filepath)
             print(f"✅ HTML报告已保存至: {filepath}")
             return filepath
         except Exception as e:
             print(f"❌ 生成HTML报告失败: {str(e)}")
-            return ""
\ No newline at end of file
+            return ""
+    
+    def apply_retention(self):
+        """
+        执行归档合并和保留策略，并清理已删除报告的索引
+        只应由单个进程调用（交互模式启动时或队列协调者汇总后），工作进程不执行
+        """
+        deleted_paths = self.storage.apply_retention()
+        if deleted_paths:
+            self.index.delete_paths(deleted_paths)
+    
+    def report_exists(self, locator: str) -> bool:
+        """判断报告是否仍然存在（单独文件或归档中）"""
+        return self.storage.exists(locator)
+    
+    def read_report(self, locator: str) -> str:
+        """读取报告内容，报告不存在时返回空字符串"""
+        return self.storage.read(locator) or ""
+    
+    def search_reports(self, symbol: str = "", text: str = "", recommendation: str = "",
+                       since: str = "", limit: int = 20) -> List[Dict[str, Any]]:
+        """通过索引查询历史报告"""
+        return self.index.search(symbol, text, recommendation, since, limit)
+    
+    def generate_comparison_report(self, results: List[Dict[str, Any]]) -> str:
+        """生成多个股票的对比报告"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"comparison_report_{timestamp}.txt"
+
+        try:
+            with io.StringIO() as f:
+                f.write("=" * 60 + "\n")
+                f.write("           智能投研助手 - 多股票对比报告\n")
+                f.write("=" * 60 + "\n\n")
+                f.write(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write(f"股票数量: {len(results)}\n\n")
+                
+                f.write("📊 关键数据对比\n")
+                f.write("-" * 60 + "\n")
+                f.write(f"{'股票代码':<10}{'公司名称':<14}{'最新股价':>10}{'涨跌幅(%)':>12}  状态\n")
+                for result in results:
+                    price_data = result.get("raw_data", {}).get("price_data", {})
+                    if "error" in result:
+                        status = "失败"
+                    elif self._get_fallback_sections(result):
+                        status = "成功(数据不完整)"
+                    else:
+                        status = "成功"
+                    f.write(f"{result['symbol']:<10}{result.get('company_name', '') or 'N/A':<14}"
+                            f"{str(price_data.get('latest_price', 'N/A')):>10}"
+                            f"{str(price_data.get('price_change_percent', 'N/A')):>12}  {status}\n")
+                f.write("\n")
+                
+                for result in results:
+                    f.write(f"🤖 {result['symbol']} {result.get('company_name', '')} AI分析结果\n")
+                    f.write("-" * 30 + "\n")
+                    f.write(result.get('analysis', ''))
+                    f.write("\n\n")
+                    report_paths = result.get("report_paths", {})
+                    if report_paths:
+                        for report_type, path in report_paths.items():
+                            if path:
+                                f.write(f"{report_type.upper()}报告: {path}\n")
+                        f.write("\n")
+                
+                f.write("=" * 60 + "\n")
+                f.write("数据来源: AKShare | 分析模型: GPT-4\n")
+                f.write("注: 本报告仅供参考，不构成投资建议\n")
+                f.write("=" * 60 + "\n")
+                content = f.getvalue()
+            
+            filepath = self.storage.save(filename, content)
+            print(f"✅ 对比报告已保存至: {filepath}")
+            return filepath
+        except Exception as e:
+            print(f"❌ 生成对比报告失败: {str(e)}")
+            return ""
@@ -0,0 +1,239 @@
+import os
+import re
+import sqlite3
+import unicodedata
+from contextlib import closing
+from typing import Dict, List, Any, Optional
+
+class ReportIndex:
+    """
+    报告索引类
+    使用SQLite记录每份报告的股票代码、时间、模型、关键指标和文件路径，
+    并通过FTS5对分析内容建立全文索引，避免遍历和grep大量报告文件
+    """
+
+    # 投资建议关键词
+    RECOMMENDATIONS = ("买入", "增持", "持有", "减持", "卖出")
+
+    def __init__(self, db_path: str = os.path.join("reports", "report_index.db")):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            has_bigram = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'reports_bigram'"
+            ).fetchone() is not None
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    symbol TEXT NOT NULL,
+                    company_name TEXT,
+                    timestamp TEXT NOT NULL,
+                    model TEXT,
+                    recommendation TEXT,
+                    latest_price REAL,
+                    price_change_percent REAL,
+                    analysis TEXT,
+                    text_path TEXT,
+                    html_path TEXT,
+                    UNIQUE (symbol, timestamp)
+                );
+                CREATE INDEX IF NOT EXISTS idx_reports_symbol ON reports(symbol, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_reports_recommendation ON reports(recommendation, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports(timestamp);
+                CREATE INDEX IF NOT EXISTS idx_reports_text_path ON reports(text_path);
+                CREATE INDEX IF NOT EXISTS idx_reports_html_path ON reports(html_path);
+
+                -- trigram分词支持中文子串检索
+                CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+                    analysis, content='reports', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS reports_ai AFTER INSERT ON reports BEGIN
+                    INSERT INTO reports_fts(rowid, analysis) VALUES (new.id, new.analysis);
+                END;
+                CREATE TRIGGER IF NOT EXISTS reports_ad AFTER DELETE ON reports BEGIN
+                    INSERT INTO reports_fts(reports_fts, rowid, analysis) VALUES ('delete', old.id, old.analysis);
+                END;
+                CREATE TRIGGER IF NOT EXISTS reports_au AFTER UPDATE OF analysis ON reports BEGIN
+                    INSERT INTO reports_fts(reports_fts, rowid, analysis) VALUES ('delete', old.id, old.analysis);
+                    INSERT INTO reports_fts(rowid, analysis) VALUES (new.id, new.analysis);
+                END;
+
+                -- trigram无法匹配少于3个字符的关键词，两字关键词使用单独的索引（见 _bigrams）
+                CREATE VIRTUAL TABLE IF NOT EXISTS reports_bigram USING fts5(terms, detail='none');
+                CREATE TRIGGER IF NOT EXISTS reports_bigram_ad AFTER DELETE ON reports BEGIN
+                    DELETE FROM reports_bigram WHERE rowid = old.id;
+                END;
+            """)
+            if not has_bigram:
+                # 为两字索引上线前已有的报告补建索引
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO reports_bigram(rowid, terms) VALUES (?, ?)",
+                        [(row["id"], self._bigrams(row["analysis"] or ""))
+                         for row in conn.execute("SELECT id, analysis FROM reports").fetchall()]
+                    )
+
+    def _bigrams(self, text: str) -> str:
+        """
+        将文本拆成相邻两字的词（如"银行业"拆为"银行 行业"），供两字关键词检索；
+        只保留由文字或数字组成的组合，标点和空白会被全文索引当作分隔符
+        """
+        text = unicodedata.normalize("NFKC", text).lower()
+        return " ".join(sorted({text[i:i + 2] for i in range(len(text) - 1) if text[i:i + 2].isalnum()}))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def extract_recommendation(self, analysis: str) -> str:
+        """从分析文本中提取投资建议（买入/增持/持有/减持/卖出）"""
+        for line in analysis.split('\n'):
+            if "建议" not in line:
+                continue
+            # 同时出现多个建议的行（如"买入/持有/卖出"）无法判断，跳过
+            found = [keyword for keyword in self.RECOMMENDATIONS if keyword in line]
+            if len(found) == 1:
+                return found[0]
+        return ""
+
+    def _to_float(self, value: Any) -> Optional[float]:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def add(self, result: Dict[str, Any], text_path: str = "", html_path: str = ""):
+        """写入或更新一份报告的索引（同一股票同一分析时间的文本/HTML报告合并为一条记录）"""
+        price_data = result.get("raw_data", {}).get("price_data", {})
+        analysis = result.get("analysis", "")
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("""
+                    INSERT INTO reports (symbol, company_name, timestamp, model, recommendation,
+                                         latest_price, price_change_percent, analysis, text_path, html_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (symbol, timestamp) DO UPDATE SET
+                        text_path = COALESCE(NULLIF(excluded.text_path, ''), text_path),
+                        html_path = COALESCE(NULLIF(excluded.html_path, ''), html_path)
+                """, (
+                    result["symbol"], result.get("company_name", ""), result["timestamp"],
+                    result.get("model", ""), self.extract_recommendation(analysis),
+                    self._to_float(price_data.get("latest_price")),
+                    self._to_float(price_data.get("price_change_percent")),
+                    analysis, text_path, html_path
+                ))
+                # 同一份报告的文本和HTML各调用一次，两字索引只在首次写入时建立（按rowid查找，不扫描整个索引）
+                row = conn.execute("""
+                    SELECT id FROM reports r WHERE symbol = ? AND timestamp = ?
+                    AND NOT EXISTS (SELECT 1 FROM reports_bigram WHERE rowid = r.id)
+                """, (result["symbol"], result["timestamp"])).fetchone()
+                if row:
+                    conn.execute("INSERT INTO reports_bigram(rowid, terms) VALUES (?, ?)",
+                                 (row["id"], self._bigrams(analysis)))
+        except Exception as e:
+            print(f"❌ 更新报告索引失败: {str(e)}")
+
+    def search(self, symbol: str = "", text: str = "", recommendation: str = "",
+               since: str = "", limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        查询报告，按分析时间倒序返回
+        symbol: 股票代码; text: 分析内容关键词; recommendation: 投资建议; since: 起始时间(如 2024-01-01)
+        关键词为3个及以上字符时使用trigram索引，2个字符时使用两字索引；
+        单个字符（或含标点的两字关键词）无法使用索引，会逐条匹配分析原文，报告较多时较慢
+        """
+        conditions = []
+        params = []
+        if symbol:
+            conditions.append("r.symbol = ?")
+            params.append(symbol)
+        if recommendation:
+            conditions.append("r.recommendation = ?")
+            params.append(recommendation)
+        if since:
+            conditions.append("r.timestamp >= ?")
+            params.append(since)
+        if text:
+            bigram = self._bigrams(text)
+            if len(text) >= 3:
+                conditions.append("r.id IN (SELECT rowid FROM reports_fts WHERE reports_fts MATCH ?)")
+                params.append('"' + text.replace('"', '""') + '"')
+            elif len(text) == 2 and bigram:
+                conditions.append("r.id IN (SELECT rowid FROM reports_bigram WHERE reports_bigram MATCH ?)")
+                params.append('"' + bigram + '"')
+            else:
+                conditions.append("r.analysis LIKE ?")
+                params.append(f"%{text}%")
+
+        sql = ("SELECT r.id, r.symbol, r.company_name, r.timestamp, r.model, r.recommendation, "
+               "r.latest_price, r.price_change_percent, r.text_path, r.html_path FROM reports r")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY r.timestamp DESC LIMIT ?"
+        params.append(limit)
+
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def latest(self, symbol: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """获取某个股票最近的N份报告"""
+        return self.search(symbol=symbol, limit=limit)
+
+    def get_analysis(self, report_id: int) -> str:
+        """获取某份报告的完整分析内容"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT analysis FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return row["analysis"] if row else ""
+
+    def delete_paths(self, paths: List[str]) -> int:
+        """删除指向这些报告文件的索引记录（报告已按保留策略删除），返回删除数量"""
+        with closing(self._connect()) as conn, conn:
+            return conn.executemany(
+                "DELETE FROM reports WHERE text_path = ? OR html_path = ?",
+                [(path, path) for path in paths]
+            ).rowcount
+    
+    def rebuild(self, storage) -> int:
+        """
+        遍历报告存储中已有的文本报告重建索引（用于索引上线前生成的报告），返回扫描到的报告数量
+        storage: FileReportStorage 或 ArchiveReportStorage，归档中的报告同样会被索引
+        """
+        pattern = re.compile(
+            r"股票代码: (?P<symbol>[^\n]*)\n公司名称: (?P<company_name>[^\n]*)\n分析时间: (?P<timestamp>[^\n]*)\n"
+            r".*?🤖 AI分析结果\n-+\n(?P<analysis>.*)\n\n=+\n", re.S
+        )
+        count = 0
+        for text_path in storage.list_reports():
+            if not text_path.endswith(".txt"):
+                continue
+            match = pattern.search(storage.read(text_path) or "")
+            if not match:
+                continue
+            html_path = text_path[:-len(".txt")] + ".html"
+            self.add(match.groupdict(), text_path=text_path,
+                     html_path=html_path if storage.exists(html_path) else "")
+            count += 1
+        return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="智能投研助手 - 报告检索")
+    parser.add_argument("--dir", default="reports", help="报告目录")
+    parser.add_argument("--symbol", default="", help="股票代码")
+    parser.add_argument("--text", default="", help="分析内容关键词")
+    parser.add_argument("--recommendation", default="", help="投资建议，如 买入/持有/卖出")
+    parser.add_argument("--since", default="", help="起始时间，如 2024-01-01")
+    parser.add_argument("--limit", type=int, default=20, help="最多返回多少条")
+    parser.add_argument("--rebuild", action="store_true", help="扫描报告目录（含归档）重建索引")
+    args = parser.parse_args()
+
+    index = ReportIndex(os.path.join(args.dir, "report_index.db"))
+    if args.rebuild:
+        from report_archive import create_report_storage
+        print(f"✅ 已索引 {index.rebuild(create_report_storage(args.dir))} 份报告")
+
+    for row in index.search(args.symbol, args.text, args.recommendation, args.since, args.limit):
+        print(f"{row['timestamp']}  {row['symbol']} {row['company_name'] or ''}  "
+              f"建议: {row['recommendation'] or '-'}  模型: {row['model'] or '-'}  "
+              f"{row['text_path'] or row['html_path']}")
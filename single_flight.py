@@ -0,0 +1,49 @@
+import threading
+from typing import Any, Callable, Hashable
+
+class _Call:
+    """一次进行中的调用，等待者共享其结果或异常"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    请求合并类
+    同一个key的调用在进行中时，后续的相同调用不再重复发起，而是等待并共享第一次调用的结果
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0  # 被合并的重复调用次数
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """执行调用；相同key的调用正在进行时，等待并返回它的结果（或抛出它的异常）"""
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
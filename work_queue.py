@@ -0,0 +1,445 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import Dict, List, Any, Optional
+from config import (QUEUE_BACKEND, QUEUE_URL, QUEUE_LEASE_SECONDS,
+                    QUEUE_MAX_ATTEMPTS, QUEUE_POLL_INTERVAL)
+
+class WorkQueue:
+    """
+    分布式任务队列基类
+    生产者提交股票列表，工作进程领取任务（带租约）并回传分析结果，
+    协调者汇总同一批次的结果
+    """
+
+    def __init__(self, lease_seconds: int = QUEUE_LEASE_SECONDS,
+                 max_attempts: int = QUEUE_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def submit(self, stock_list: List[Dict[str, str]]) -> str:
+        """提交一个批次的股票，返回批次ID"""
+        raise NotImplementedError
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """领取一个待处理任务，没有任务时返回None"""
+        raise NotImplementedError
+
+    def complete(self, job: Dict[str, Any], worker_id: str, result: Dict[str, Any]) -> bool:
+        """回传任务结果，租约已被他人接管时返回False"""
+        raise NotImplementedError
+
+    def fail(self, job: Dict[str, Any], worker_id: str, error: str,
+             result: Optional[Dict[str, Any]] = None) -> bool:
+        """标记任务失败，未达到最大尝试次数时重新入队"""
+        raise NotImplementedError
+
+    def batch_jobs(self, batch_id: str) -> List[Dict[str, Any]]:
+        """按提交顺序返回批次内的所有任务"""
+        raise NotImplementedError
+
+    def batch_status(self, batch_id: str) -> Dict[str, int]:
+        """统计批次内各状态的任务数量"""
+        status = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        for job in self.batch_jobs(batch_id):
+            status[job["status"]] = status.get(job["status"], 0) + 1
+        return status
+
+    def _dump_result(self, result: Optional[Dict[str, Any]]) -> Optional[str]:
+        """序列化分析结果（AKShare返回的数据可能包含numpy/日期类型）"""
+        if result is None:
+            return None
+        return json.dumps(result, ensure_ascii=False, default=str)
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """基于SQLite的任务队列，适合单机多进程或本地测试"""
+
+    def __init__(self, db_path: str = QUEUE_URL, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    batch_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    symbol TEXT NOT NULL,
+                    name TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_until REAL,
+                    result TEXT,
+                    error TEXT,
+                    updated_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, lease_until)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(batch_id, position)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def submit(self, stock_list: List[Dict[str, str]]) -> str:
+        batch_id = new_batch_id()
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO jobs (batch_id, position, symbol, name, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(batch_id, i, stock["symbol"], stock.get("name", ""), now)
+                 for i, stock in enumerate(stock_list)]
+            )
+            conn.execute("COMMIT")
+        return batch_id
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # 租约过期且已用完尝试次数的任务直接标记为失败
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = '租约超时', updated_at = ? "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' "
+                "OR (status = 'leased' AND lease_until < ?) ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_until = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            job = dict(row)
+            job["attempts"] += 1
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, job: Dict[str, Any], worker_id: str, result: Dict[str, Any]) -> bool:
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (self._dump_result(result), time.time(), job["id"], worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job: Dict[str, Any], worker_id: str, error: str,
+             result: Optional[Dict[str, Any]] = None) -> bool:
+        status = "failed" if job["attempts"] >= self.max_attempts else "pending"
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, lease_owner = NULL, "
+                "lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (status, error, self._dump_result(result), time.time(), job["id"], worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def batch_jobs(self, batch_id: str) -> List[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE batch_id = ? ORDER BY position", (batch_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class RedisWorkQueue(WorkQueue):
+    """基于Redis的任务队列，适合多台机器共同处理（需要安装redis库）"""
+
+    def __init__(self, url: str = QUEUE_URL, prefix: str = "research_queue", **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("使用Redis队列需要先安装redis库: pip install redis")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._requeue_expired_script = self.client.register_script(self.REQUEUE_EXPIRED_SCRIPT)
+        self._lease_script = self.client.register_script(self.LEASE_SCRIPT)
+        self._finish_script = self.client.register_script(self.FINISH_SCRIPT)
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    def submit(self, stock_list: List[Dict[str, str]]) -> str:
+        batch_id = new_batch_id()
+        pipe = self.client.pipeline()
+        for i, stock in enumerate(stock_list):
+            job_id = str(self.client.incr(self._key("next_id")))
+            pipe.hset(self._key("job", job_id), mapping={
+                "id": job_id, "batch_id": batch_id, "position": i,
+                "symbol": stock["symbol"], "name": stock.get("name", ""),
+                "status": "pending", "attempts": 0, "updated_at": time.time()
+            })
+            pipe.rpush(self._key("batch", batch_id), job_id)
+            pipe.rpush(self._key("pending"), job_id)
+        pipe.execute()
+        return batch_id
+
+    # 以下操作都通过Lua脚本在Redis中原子执行，工作进程在任意一步崩溃或断线都不会丢失任务
+
+    # 将租约过期的任务重新放回队列，或在用完尝试次数时标记为失败
+    # KEYS: leases, pending; ARGV: now, max_attempts, prefix
+    REQUEUE_EXPIRED_SCRIPT = """
+        local ids = redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1])
+        for _, id in ipairs(ids) do
+            redis.call('ZREM', KEYS[1], id)
+            local job_key = ARGV[3] .. ':job:' .. id
+            if tonumber(redis.call('HGET', job_key, 'attempts') or '0') >= tonumber(ARGV[2]) then
+                redis.call('HSET', job_key, 'status', 'failed', 'error', '租约超时', 'updated_at', ARGV[1])
+            else
+                redis.call('HSET', job_key, 'status', 'pending', 'lease_owner', '', 'updated_at', ARGV[1])
+                redis.call('RPUSH', KEYS[2], id)
+            end
+        end
+        return #ids
+    """
+
+    # 取出一个待处理任务并登记租约
+    # KEYS: pending, leases; ARGV: now, lease_until, worker_id, prefix
+    LEASE_SCRIPT = """
+        local id = redis.call('LPOP', KEYS[1])
+        if not id then
+            return false
+        end
+        local job_key = ARGV[4] .. ':job:' .. id
+        redis.call('HINCRBY', job_key, 'attempts', 1)
+        redis.call('HSET', job_key, 'status', 'leased', 'lease_owner', ARGV[3],
+                   'lease_until', ARGV[2], 'updated_at', ARGV[1])
+        redis.call('ZADD', KEYS[2], ARGV[2], id)
+        return id
+    """
+
+    # 租约持有者回传结果并释放租约，状态为pending时重新入队
+    # KEYS: leases, pending, job_key; ARGV: job_id, worker_id, status, error, result, now
+    FINISH_SCRIPT = """
+        if redis.call('HGET', KEYS[3], 'lease_owner') ~= ARGV[2] then
+            return 0
+        end
+        if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+            return 0
+        end
+        redis.call('HSET', KEYS[3], 'status', ARGV[3], 'error', ARGV[4], 'result', ARGV[5],
+                   'updated_at', ARGV[6])
+        if ARGV[3] == 'pending' then
+            redis.call('HSET', KEYS[3], 'lease_owner', '')
+            redis.call('RPUSH', KEYS[2], ARGV[1])
+        end
+        return 1
+    """
+
+    def _requeue_expired(self):
+        """将租约过期的任务重新放回队列"""
+        self._requeue_expired_script(keys=[self._key("leases"), self._key("pending")],
+                                     args=[time.time(), self.max_attempts, self.prefix])
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        self._requeue_expired()
+        now = time.time()
+        job_id = self._lease_script(keys=[self._key("pending"), self._key("leases")],
+                                    args=[now, now + self.lease_seconds, worker_id, self.prefix])
+        if not job_id:
+            return None
+        job = self.client.hgetall(self._key("job", job_id))
+        job["attempts"] = int(job["attempts"])
+        return job
+
+    def _finish(self, job: Dict[str, Any], worker_id: str, status: str, error: str,
+                result: Optional[Dict[str, Any]]) -> bool:
+        """释放租约并写入结果，只有当前租约持有者才能回传结果"""
+        job_id = str(job["id"])
+        return bool(self._finish_script(
+            keys=[self._key("leases"), self._key("pending"), self._key("job", job_id)],
+            args=[job_id, worker_id, status, error, self._dump_result(result) or "", time.time()]
+        ))
+
+    def complete(self, job: Dict[str, Any], worker_id: str, result: Dict[str, Any]) -> bool:
+        return self._finish(job, worker_id, "done", "", result)
+
+    def fail(self, job: Dict[str, Any], worker_id: str, error: str,
+             result: Optional[Dict[str, Any]] = None) -> bool:
+        status = "failed" if int(job["attempts"]) >= self.max_attempts else "pending"
+        return self._finish(job, worker_id, status, error, result)
+
+    def batch_jobs(self, batch_id: str) -> List[Dict[str, Any]]:
+        jobs = []
+        for job_id in self.client.lrange(self._key("batch", batch_id), 0, -1):
+            job = self.client.hgetall(self._key("job", job_id))
+            job["attempts"] = int(job.get("attempts", 0))
+            job["result"] = job.get("result") or None
+            jobs.append(job)
+        return jobs
+
+
+def new_batch_id() -> str:
+    """生成批次ID（时间戳 + 随机后缀，多个生产者同时提交也不会冲突）"""
+    return f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def create_work_queue(backend: str = QUEUE_BACKEND, url: str = QUEUE_URL) -> WorkQueue:
+    """根据配置创建任务队列"""
+    if backend == "sqlite":
+        return SQLiteWorkQueue(url)
+    if backend == "redis":
+        return RedisWorkQueue(url)
+    raise ValueError(f"不支持的队列后端: {backend}")
+
+
+class QueueWorker:
+    """
+    队列工作进程
+    循环领取任务，复用现有的数据获取/分析/报告流程处理单个股票
+    """
+
+    def __init__(self, queue: WorkQueue, assistant=None, worker_id: str = ""):
+        if assistant is None:
+            from main import InvestmentResearchAssistant
+            assistant = InvestmentResearchAssistant()
+        self.queue = queue
+        self.assistant = assistant
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    def process(self, job: Dict[str, Any]):
+        """处理单个任务并回传结果"""
+        print(f"\n🛠️ [{self.worker_id}] 领取任务: {job['symbol']} {job.get('name', '')} "
+              f"(第{job['attempts']}次尝试)")
+        result = self.assistant.analyze_single_stock(job["symbol"], job.get("name", ""))
+        if "error" in result:
+            accepted = self.queue.fail(job, self.worker_id, result["error"], result)
+        else:
+            accepted = self.queue.complete(job, self.worker_id, result)
+        if not accepted:
+            print(f"⚠️ {job['symbol']} 的租约已过期，结果已丢弃")
+
+    def run(self, exit_when_empty: bool = False, poll_interval: float = QUEUE_POLL_INTERVAL,
+            delay: float = 3):
+        """持续处理任务，exit_when_empty=True时队列为空即退出"""
+        print(f"👷 工作进程 {self.worker_id} 启动")
+        processed = 0
+        while True:
+            job = self.queue.lease(self.worker_id)
+            if job is None:
+                if exit_when_empty:
+                    break
+                time.sleep(poll_interval)
+                continue
+            self.process(job)
+            processed += 1
+            # 添加延迟，避免请求过于频繁
+            time.sleep(delay)
+        print(f"👷 工作进程 {self.worker_id} 退出，共处理 {processed} 个任务")
+
+
+class QueueCoordinator:
+    """
+    队列协调者
+    提交批次、等待所有任务结束，并汇总生成对比报告
+    """
+
+    def __init__(self, queue: WorkQueue, report_generator=None):
+        if report_generator is None:
+            from report_generator import ReportGenerator
+            report_generator = ReportGenerator()
+        self.queue = queue
+        self.report_generator = report_generator
+
+    def submit(self, stock_list: List[Dict[str, str]]) -> str:
+        batch_id = self.queue.submit(stock_list)
+        print(f"📤 已提交批次 {batch_id}，共 {len(stock_list)} 个股票")
+        return batch_id
+
+    def wait(self, batch_id: str, poll_interval: float = QUEUE_POLL_INTERVAL,
+             timeout: Optional[float] = None) -> bool:
+        """等待批次内所有任务完成或失败，超时返回False"""
+        start_time = time.time()
+        while True:
+            status = self.queue.batch_status(batch_id)
+            if status["pending"] == 0 and status["leased"] == 0:
+                return True
+            print(f"⏳ 批次 {batch_id}: 完成 {status['done']}, 失败 {status['failed']}, "
+                  f"处理中 {status['leased']}, 等待 {status['pending']}")
+            if timeout is not None and time.time() - start_time > timeout:
+                return False
+            time.sleep(poll_interval)
+
+    def collect(self, batch_id: str) -> List[Dict[str, Any]]:
+        """按提交顺序汇总批次结果并生成对比报告"""
+        results = []
+        for job in self.queue.batch_jobs(batch_id):
+            if job.get("result"):
+                result = json.loads(job["result"])
+            else:
+                result = {
+                    "symbol": job["symbol"],
+                    "company_name": job.get("name", ""),
+                    "timestamp": "",
+                    "error": job.get("error") or f"任务状态: {job['status']}",
+                    "analysis": f"分析过程中出现错误: {job.get('error') or job['status']}"
+                }
+            results.append(result)
+
+        if len(results) > 1:
+            self.report_generator.generate_comparison_report(results)
+        
+        # 归档合并和保留策略由协调者统一执行，避免多个工作进程同时处理
+        self.report_generator.apply_retention()
+
+        failed = sum(1 for r in results if "error" in r)
+        print(f"\n📋 批次 {batch_id} 汇总: 共 {len(results)} 个股票, "
+              f"成功 {len(results) - failed} 个, 失败 {failed} 个")
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import DEFAULT_STOCKS
+
+    parser = argparse.ArgumentParser(description="智能投研助手 - 分布式批量分析")
+    parser.add_argument("command", choices=["submit", "worker", "collect"],
+                        help="submit: 提交批次并等待汇总; worker: 启动工作进程; collect: 汇总已有批次")
+    parser.add_argument("symbols", nargs="*", help="股票代码列表（submit时使用，默认使用DEFAULT_STOCKS）")
+    parser.add_argument("--batch", help="批次ID（collect时使用）")
+    parser.add_argument("--no-wait", action="store_true", help="submit后不等待结果")
+    parser.add_argument("--exit-when-empty", action="store_true", help="worker在队列为空时退出")
+    parser.add_argument("--timeout", type=float, help="最多等待多少秒，超时后汇总已完成的结果")
+    args = parser.parse_args()
+
+    work_queue = create_work_queue()
+    if args.command == "worker":
+        QueueWorker(work_queue).run(exit_when_empty=args.exit_when_empty)
+    elif args.command == "submit":
+        stocks = [{"symbol": s, "name": ""} for s in args.symbols] or DEFAULT_STOCKS
+        coordinator = QueueCoordinator(work_queue)
+        batch_id = coordinator.submit(stocks)
+        if not args.no_wait:
+            if not coordinator.wait(batch_id, timeout=args.timeout):
+                print(f"⚠️ 等待超时，未完成的任务将在汇总中标记为未完成")
+            coordinator.collect(batch_id)
+    else:
+        if not args.batch:
+            parser.error("collect 需要指定 --batch")
+        coordinator = QueueCoordinator(work_queue)
+        if not coordinator.wait(args.batch, timeout=args.timeout):
+            print(f"⚠️ 等待超时，未完成的任务将在汇总中标记为未完成")
+        coordinator.collect(args.batch)